@@ -85,7 +85,9 @@ class PIDController:
 
 # ===== 模糊控制器 =====
 class FuzzyController:
-    def __init__(self):
+    def __init__(self, verbose=False):
+        self.verbose = verbose  # 为 True 时每步打印输入与输出，便于调试
+        self.fallback_count = 0  # 规则未覆盖输入、输出回退为 0 的次数
         # 定义输入变量：误差及其变化率
         self.error = ctrl.Antecedent(np.linspace(-0.3, 0.3, 61), 'error')
         self.error_dot = ctrl.Antecedent(np.linspace(-0.2, 0.2, 61), 'error_dot')
@@ -136,34 +138,43 @@ class FuzzyController:
         self.sim.input['error'] = error_value
         self.sim.input['error_dot'] = error_dot_value
         self.sim.compute()
-        print(f"Input: error={error_value}, error_dot={error_dot_value}")
-        print(f"Computed Output: {self.sim.output}")
+        if self.verbose:
+            print(f"Input: error={error_value}, error_dot={error_dot_value}")
+            print(f"Computed Output: {self.sim.output}")
         if 'alpha_cmd' not in self.sim.output:
-            print(f"Error: The output 'alpha_cmd' was not found. Current input values: error={error_value}, error_dot={error_dot_value}")
+            self.fallback_count += 1
+            if self.verbose:
+                print(f"Error: The output 'alpha_cmd' was not found. Current input values: error={error_value}, error_dot={error_dot_value}")
             return 0.0
         return self.sim.output['alpha_cmd']
 
 # 创建全局模糊控制器实例
 fuzzy_controller = FuzzyController()
 
+# ===== 工况设置 =====
+def scenario_conditions(scenario):
+    # 返回 (初始姿态角, 轨迹跟踪目标角, 扰动/换向时间, 扰动幅度)
+    if scenario == 1:
+        initial_phi = np.deg2rad(10.0)
+    else:
+        initial_phi = 0.0
+    phi_des_step = np.deg2rad(5.0) if scenario == 3 else 0.0
+    disturbance_time = 2.0     # 扰动时间 (s)
+    disturbance_value = np.deg2rad(2.86)  # 扰动幅度
+    return initial_phi, phi_des_step, disturbance_time, disturbance_value
+
 # ===== 仿真运行函数 =====
 def run_simulation(scenario, Kp, Ki, Kd,
                    J=0.01, B=0.1, Kt=1.0,
                    K_h=0.2, tau_h=0.5, spool_max=0.5,
                    t_end=5.0, dt_sim=0.001, update_progress=None):
     # 根据工况设置初始条件
-    if scenario == 1:
-        initial_phi = np.deg2rad(10.0)
-    else:
-        initial_phi = 0.0
+    initial_phi, phi_des_step, disturbance_time, disturbance_value = scenario_conditions(scenario)
 
     system = CombinedSystem(J, B, Kt, K_h, tau_h, spool_max, initial_phi)
     pid = PIDController(Kp, Ki, Kd, dt_sim, output_limit=10.0)
 
     phi_des = 0.0              # 目标姿态角 (rad)
-    phi_des_step = np.deg2rad(5.0) if scenario == 3 else 0.0
-    disturbance_time = 2.0     # 扰动时间 (s)
-    disturbance_value = np.deg2rad(2.86)  # 扰动幅度
 
     time_list = []
     phi_list = []
@@ -0,0 +1,359 @@
+# realtime.py
+# 实时节拍执行模式：按墙钟时间以 dt_sim 为周期运行控制回路，
+# 统计每一步控制计算的耗时分布、超时次数与节拍抖动，用于评估控制器能否放进井下板卡的时间预算。
+import argparse
+import math
+import multiprocessing as mp
+import time
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from models import CombinedSystem, FuzzyController, PIDController, scenario_conditions
+
+DEFAULT_AUTHKEY = b"drillsim"
+MAX_STEPS = 1_000_000  # 单次节拍运行的最大步数 t_end / dt_sim
+SPIN_NS = 200_000  # 距离节拍起点不足 200 µs 时改为忙等，减小 sleep 粒度带来的抖动
+HIST_EDGES_US = np.concatenate(([0.0], np.logspace(0, 5, 26)))  # 1 µs ~ 100 ms 对数分桶
+
+
+class PlantError(Exception):
+    pass
+
+
+# ===== 被控对象 =====
+class LocalPlant:
+    # 在本进程内直接推进 CombinedSystem
+    def __init__(self, J, B, Kt, K_h, tau_h, spool_max, initial_phi=0.0):
+        self.system = CombinedSystem(J, B, Kt, K_h, tau_h, spool_max, initial_phi)
+
+    @property
+    def phi(self):
+        return self.system.hydr.phi
+
+    @property
+    def theta(self):
+        return self.system.motor.theta
+
+    def step(self, U, dt):
+        phi = self.system.step(U, dt)
+        return phi, self.system.motor.theta
+
+    def disturb(self, delta):
+        self.system.hydr.phi += delta
+
+    def close(self):
+        pass
+
+
+class RemotePlant:
+    # 通过管道或套接字连接到独立进程中的被控对象，模拟控制板与对象之间的通信
+    def __init__(self, conn, J, B, Kt, K_h, tau_h, spool_max, initial_phi=0.0, process=None):
+        self.conn = conn
+        self.process = process
+        self._request("reset", J, B, Kt, K_h, tau_h, spool_max, initial_phi)
+
+    def _request(self, command, *args):
+        self.conn.send((command, args))
+        status, payload = self.conn.recv()
+        if status != "ok":
+            raise PlantError(payload)
+        self.phi, self.theta = payload
+
+    def step(self, U, dt):
+        self._request("step", U, dt)
+        return self.phi, self.theta
+
+    def disturb(self, delta):
+        self._request("disturb", delta)
+
+    def close(self):
+        try:
+            self.conn.send(("close", ()))
+        except (OSError, EOFError):
+            pass
+        self.conn.close()
+        if self.process is not None:
+            self.process.join(timeout=5)
+
+
+def _plant_loop(conn):
+    plant = None
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            break
+        if command == "close":
+            break
+        # 每条命令回复 ("ok", (phi, theta)) 或 ("error", 错误信息)
+        try:
+            if command == "reset":
+                plant = LocalPlant(*args)
+            elif plant is None:
+                raise PlantError(f"收到 {command!r} 前未执行 reset")
+            elif command == "step":
+                plant.step(*args)
+            elif command == "disturb":
+                plant.disturb(*args)
+            else:
+                raise PlantError(f"未知命令: {command!r}")
+        except Exception as exc:
+            conn.send(("error", repr(exc)))
+            continue
+        conn.send(("ok", (plant.phi, plant.theta)))
+    conn.close()
+
+
+def serve_plant(address, authkey=DEFAULT_AUTHKEY):
+    # 以套接字方式提供被控对象，每次只服务一个控制端连接；单个连接出错不影响后续连接
+    with Listener(address, authkey=authkey) as listener:
+        print(f"被控对象服务已启动: {address[0]}:{address[1]}")
+        while True:
+            try:
+                with listener.accept() as conn:
+                    _plant_loop(conn)
+            except Exception as exc:
+                print(f"被控对象连接异常: {exc!r}")
+
+
+def open_plant(plant, params, initial_phi, authkey=DEFAULT_AUTHKEY):
+    # plant 取值："local" 本进程，"pipe" 子进程 + 管道，"host:port" 连接已启动的被控对象服务
+    if plant == "local":
+        return LocalPlant(*params, initial_phi)
+    if plant == "pipe":
+        parent_conn, child_conn = mp.Pipe()
+        process = mp.Process(target=_plant_loop, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return RemotePlant(parent_conn, *params, initial_phi, process=process)
+    host, _, port = plant.rpartition(":")
+    conn = Client((host or "127.0.0.1", int(port)), authkey=authkey)
+    return RemotePlant(conn, *params, initial_phi)
+
+
+# ===== 耗时统计 =====
+class LatencyStats:
+    def __init__(self, name, samples_ns):
+        self.name = name
+        self.samples_us = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+
+    def percentile(self, q):
+        return float(np.percentile(self.samples_us, q))
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p99(self):
+        return self.percentile(99)
+
+    @property
+    def max(self):
+        return float(self.samples_us.max())
+
+    @property
+    def mean(self):
+        return float(self.samples_us.mean())
+
+    def histogram(self):
+        counts, edges = np.histogram(np.clip(self.samples_us, 0, HIST_EDGES_US[-1]), bins=HIST_EDGES_US)
+        return counts, edges
+
+    def summary(self):
+        return {"p50_us": self.p50, "p99_us": self.p99, "max_us": self.max, "mean_us": self.mean}
+
+
+class PacedReport:
+    def __init__(self, dt_sim, plant, paced, stats, deadline_misses, overruns, skipped_periods,
+                 fuzzy_fallbacks, wall_time, result):
+        self.dt_sim = dt_sim
+        self.plant = plant
+        self.paced = paced
+        self.stats = stats                    # 名称 -> LatencyStats
+        self.deadline_misses = deadline_misses  # 控制计算（模糊 + PID）超出 dt_sim 的步数
+        self.overruns = overruns              # 整步（含对象推进/通信）超出 dt_sim 的步数
+        self.skipped_periods = skipped_periods  # 因超时而跳过的节拍数
+        self.fuzzy_fallbacks = fuzzy_fallbacks  # 模糊规则未覆盖、输出回退为 0 的步数
+        self.wall_time = wall_time
+        self.result = result                  # (time_list, phi_list, theta_list, phi_des_list)
+
+    @property
+    def steps(self):
+        return len(self.result[0])
+
+    def format(self, histogram="control"):
+        budget_us = self.dt_sim * 1e6
+        lines = [
+            f"节拍模式: {'墙钟节拍' if self.paced else '不限速'}  被控对象: {self.plant}  "
+            f"步数: {self.steps}  周期预算: {budget_us:.0f} µs  总耗时: {self.wall_time:.3f} s",
+            f"{'项目':<10}{'p50 (µs)':>12}{'p99 (µs)':>12}{'max (µs)':>12}{'mean (µs)':>12}",
+        ]
+        for name, stat in self.stats.items():
+            lines.append(f"{name:<10}{stat.p50:>12.1f}{stat.p99:>12.1f}{stat.max:>12.1f}{stat.mean:>12.1f}")
+        lines.append(f"控制计算超时: {self.deadline_misses} 步 ({self.deadline_misses / self.steps:.2%})  "
+                     f"整步超时: {self.overruns} 步 ({self.overruns / self.steps:.2%})  "
+                     f"跳过节拍: {self.skipped_periods}  模糊输出回退: {self.fuzzy_fallbacks} 步")
+        if histogram in self.stats:
+            counts, edges = self.stats[histogram].histogram()
+            peak = counts.max() or 1
+            lines.append(f"{histogram} 耗时直方图:")
+            for count, lo, hi in zip(counts, edges[:-1], edges[1:]):
+                if count:
+                    bar = "#" * max(1, int(40 * count / peak))
+                    mark = " *" if hi > budget_us else ""
+                    lines.append(f"  {lo:>9.1f} - {hi:>9.1f} µs {count:>7d} {bar}{mark}")
+        return "\n".join(lines)
+
+
+# ===== 节拍执行 =====
+def _wait_until(deadline_ns):
+    remaining = deadline_ns - time.perf_counter_ns()
+    if remaining > SPIN_NS:
+        time.sleep((remaining - SPIN_NS) / 1e9)
+    while time.perf_counter_ns() < deadline_ns:
+        pass
+
+
+def _check_args(scenario, t_end, dt_sim, **values):
+    if scenario not in (1, 2, 3):
+        raise ValueError("scenario 必须为 1、2 或 3")
+    for name, value in dict(values, t_end=t_end, dt_sim=dt_sim).items():
+        if not math.isfinite(value):
+            raise ValueError(f"参数 {name} 必须为有限数值: {value!r}")
+    if dt_sim < 1e-9 or t_end <= 0:
+        raise ValueError("t_end 必须为正数，dt_sim 不能小于 1 ns")
+    if t_end / dt_sim > MAX_STEPS:
+        raise ValueError(f"仿真步数 t_end / dt_sim 不能超过 {MAX_STEPS}")
+
+
+def run_paced(scenario, Kp, Ki, Kd,
+              J=0.01, B=0.1, Kt=1.0,
+              K_h=0.2, tau_h=0.5, spool_max=0.5,
+              t_end=5.0, dt_sim=0.001,
+              plant="local", paced=True, fuzzy=None, authkey=DEFAULT_AUTHKEY):
+    # 控制律与 run_simulation 相同；fuzzy 可替换为任意带 compute(error, error_dot) 的控制器实现，
+    # 默认使用不打印的模糊控制器，避免调试输出计入耗时
+    _check_args(scenario, t_end, dt_sim, Kp=Kp, Ki=Ki, Kd=Kd, J=J, B=B, Kt=Kt,
+                K_h=K_h, tau_h=tau_h, spool_max=spool_max)
+    initial_phi, phi_des_step, disturbance_time, disturbance_value = scenario_conditions(scenario)
+    fuzzy = fuzzy or FuzzyController(verbose=False)
+    pid = PIDController(Kp, Ki, Kd, dt_sim, output_limit=10.0)
+    target = open_plant(plant, (J, B, Kt, K_h, tau_h, spool_max), initial_phi, authkey)
+
+    steps = int(t_end / dt_sim)
+    period_ns = int(round(dt_sim * 1e9))
+    jitter = np.zeros(steps + 1, dtype=np.int64)
+    fuzzy_ns = np.zeros(steps + 1, dtype=np.int64)
+    pid_ns = np.zeros(steps + 1, dtype=np.int64)
+    plant_ns = np.zeros(steps + 1, dtype=np.int64)
+
+    time_list = []
+    phi_list = []
+    theta_list = []
+    phi_des_list = []
+    phi_des = 0.0
+    phi = target.phi
+    theta = target.theta
+    prev_error = phi_des - phi
+
+    skipped_periods = 0
+    fallbacks_before = getattr(fuzzy, "fallback_count", 0)
+    try:
+        start = time.perf_counter_ns()
+        release = start  # 本步的释放时刻
+        for i in range(steps + 1):
+            t = i * dt_sim
+            if paced:
+                _wait_until(release)
+            t0 = time.perf_counter_ns()
+            jitter[i] = t0 - release if paced else 0
+
+            disturb_ns = 0
+            if scenario == 2 and abs(t - disturbance_time) < 1e-9:
+                # 施加扰动同样是一次对象交互（远程时为一次完整往返），计入本步的 plant 耗时
+                d0 = time.perf_counter_ns()
+                target.disturb(disturbance_value)
+                phi = target.phi
+                disturb_ns = time.perf_counter_ns() - d0
+            if scenario == 3 and t >= disturbance_time:
+                phi_des = phi_des_step
+
+            error = phi_des - phi
+            d_error = (error - prev_error) / dt_sim
+            prev_error = error
+
+            t1 = time.perf_counter_ns()
+            alpha_cmd = fuzzy.compute(error, d_error)
+            t2 = time.perf_counter_ns()
+            U = pid.compute(alpha_cmd - theta)
+            t3 = time.perf_counter_ns()
+            phi, theta = target.step(U, dt_sim)
+            t4 = time.perf_counter_ns()
+
+            fuzzy_ns[i] = t2 - t1
+            pid_ns[i] = t3 - t2
+            plant_ns[i] = t4 - t3 + disturb_ns
+
+            if paced:
+                release += period_ns
+                if t4 > release:
+                    # 本步超出周期：跳过已错过的节拍，下一步在当前时刻之后的第一个周期边界释放
+                    missed = (t4 - release) // period_ns + 1
+                    skipped_periods += missed
+                    release += missed * period_ns
+
+            time_list.append(t)
+            phi_list.append(phi)
+            theta_list.append(theta)
+            phi_des_list.append(phi_des)
+        wall_time = (time.perf_counter_ns() - start) / 1e9
+    finally:
+        target.close()
+
+    control_ns = fuzzy_ns + pid_ns
+    step_ns = control_ns + plant_ns
+    stats = {
+        "fuzzy": LatencyStats("fuzzy", fuzzy_ns),
+        "pid": LatencyStats("pid", pid_ns),
+        "control": LatencyStats("control", control_ns),
+        "plant": LatencyStats("plant", plant_ns),
+        "step": LatencyStats("step", step_ns),
+    }
+    if paced:
+        stats["jitter"] = LatencyStats("jitter", jitter)
+    return PacedReport(dt_sim, plant, paced, stats,
+                       deadline_misses=int((control_ns > period_ns).sum()),
+                       overruns=int((step_ns > period_ns).sum()),
+                       skipped_periods=skipped_periods,
+                       fuzzy_fallbacks=getattr(fuzzy, "fallback_count", 0) - fallbacks_before,
+                       wall_time=wall_time,
+                       result=(time_list, phi_list, theta_list, phi_des_list))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="智能钻头控制回路实时节拍执行与耗时统计")
+    parser.add_argument("--scenario", type=int, default=1, choices=(1, 2, 3))
+    parser.add_argument("--Kp", type=float, default=40.0)
+    parser.add_argument("--Ki", type=float, default=5.0)
+    parser.add_argument("--Kd", type=float, default=5.0)
+    parser.add_argument("--t-end", type=float, default=5.0)
+    parser.add_argument("--dt-sim", type=float, default=0.001)
+    parser.add_argument("--plant", default="local",
+                        help='被控对象："local"、"pipe" 或被控对象服务地址 "host:port"')
+    parser.add_argument("--no-pace", action="store_true", help="不按墙钟节拍，尽快运行")
+    parser.add_argument("--serve-plant", metavar="HOST:PORT", help="以套接字方式启动被控对象服务")
+    args = parser.parse_args()
+
+    if args.serve_plant:
+        host, _, port = args.serve_plant.rpartition(":")
+        serve_plant((host or "127.0.0.1", int(port)))
+    else:
+        try:
+            report = run_paced(args.scenario, args.Kp, args.Ki, args.Kd,
+                               t_end=args.t_end, dt_sim=args.dt_sim,
+                               plant=args.plant, paced=not args.no_pace)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(report.format())
@@ -0,0 +1,143 @@
+# runstore.py
+# 会话内的多次仿真结果存储：以紧凑的 float32 数组保存每次运行及其参数，
+# 相同时间轴的运行共享同一个时间数组，总内存超过上限时按最近最少使用淘汰。
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 默认内存上限 64 MB
+DEFAULT_MAX_POINTS = 2000             # 叠加绘图时每条曲线的最大点数
+
+
+class StoredRun:
+    def __init__(self, run_id, params, time, data):
+        self.run_id = run_id
+        self.params = params
+        self.time = time        # 共享的时间数组 (s)
+        self.data = data        # shape (3, N)：phi、theta、phi_des (rad)
+        self.decimated = {}     # max_points -> (t, phi, theta) 抽稀缓存
+
+    @property
+    def phi(self):
+        return self.data[0]
+
+    @property
+    def theta(self):
+        return self.data[1]
+
+    @property
+    def phi_des(self):
+        return self.data[2]
+
+    @property
+    def label(self):
+        p = self.params
+        return f"#{self.run_id} 工况{p.get('scenario')} Kp={p.get('Kp')} Ki={p.get('Ki')} Kd={p.get('Kd')}"
+
+    @property
+    def nbytes(self):
+        # 时间数组由共享池单独计入
+        return self.data.nbytes + sum(a.nbytes for arrays in self.decimated.values() for a in arrays)
+
+
+def decimate_minmax(time, *series, max_points=DEFAULT_MAX_POINTS):
+    # 分桶保留每个桶内各曲线的极小值与极大值点，抽稀后尖峰和超调不会丢失
+    n = len(time)
+    if n <= max_points:
+        return (time,) + series
+    per_bucket = 2 * len(series)
+    n_buckets = max(1, max_points // per_bucket)
+    bucket = -(-n // n_buckets)  # 向上取整
+    n_full = (n // bucket) * bucket
+    starts = np.arange(0, n_full, bucket)
+    idx = [np.array([0, n - 1])]
+    for y in series:
+        blocks = y[:n_full].reshape(-1, bucket)
+        idx.append(starts + blocks.argmin(axis=1))
+        idx.append(starts + blocks.argmax(axis=1))
+        if n_full < n:
+            tail = y[n_full:]
+            idx.append(np.array([n_full + tail.argmin(), n_full + tail.argmax()]))
+    idx = np.unique(np.concatenate(idx))
+    return (time[idx],) + tuple(y[idx] for y in series)
+
+
+class RunStore:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_points=DEFAULT_MAX_POINTS):
+        self.max_bytes = max_bytes
+        self.max_points = max_points
+        self._runs = OrderedDict()   # run_id -> StoredRun，按最近使用顺序排列
+        self._times = {}             # (N, dt) -> [时间数组, 引用计数]
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self._runs)
+
+    def __contains__(self, run_id):
+        return run_id in self._runs
+
+    def runs(self):
+        # 按编号顺序返回，便于界面列表保持稳定
+        return sorted(self._runs.values(), key=lambda run: run.run_id)
+
+    @property
+    def nbytes(self):
+        return (sum(run.nbytes for run in self._runs.values())
+                + sum(entry[0].nbytes for entry in self._times.values()))
+
+    def add(self, params, time_list, phi_list, theta_list, phi_des_list):
+        data = np.array([phi_list, theta_list, phi_des_list], dtype=np.float32)
+        time = self._acquire_time(time_list, params.get("dt_sim"))
+        run = StoredRun(self._next_id, dict(params), time, data)
+        self._next_id += 1
+        self._runs[run.run_id] = run
+        self._evict(keep={run.run_id})
+        return run.run_id
+
+    def get(self, run_id):
+        run = self._runs[run_id]
+        self._runs.move_to_end(run_id)
+        return run
+
+    def decimated(self, run_id, max_points=None, keep=()):
+        # keep 中的运行（如当前正在叠加的选择）不会因本次缓存而被淘汰
+        run = self.get(run_id)
+        max_points = max_points or self.max_points
+        if max_points not in run.decimated:
+            run.decimated[max_points] = decimate_minmax(run.time, run.phi, run.theta,
+                                                        max_points=max_points)
+            # 抽稀缓存同样计入内存上限
+            self._evict(keep={run_id, *keep})
+        return run.decimated[max_points]
+
+    def remove(self, run_id):
+        run = self._runs.pop(run_id)
+        self._release_time(run)
+
+    def _acquire_time(self, time_list, dt_sim):
+        # 同一步长、同一点数的运行时间轴完全相同，只保存一份
+        n = len(time_list)
+        dt = dt_sim if dt_sim is not None else (time_list[1] - time_list[0] if n > 1 else 0.0)
+        key = (n, float(dt))
+        entry = self._times.get(key)
+        if entry is None:
+            entry = self._times[key] = [np.asarray(time_list, dtype=np.float32), 0]
+            entry[0].flags.writeable = False
+        entry[1] += 1
+        return entry[0]
+
+    def _release_time(self, run):
+        for key, entry in list(self._times.items()):
+            if entry[0] is run.time:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._times[key]
+                break
+
+    def _evict(self, keep=()):
+        # 最近最少使用的运行先被淘汰，keep 中的运行始终保留
+        for run_id in list(self._runs):
+            if self.nbytes <= self.max_bytes:
+                break
+            if run_id not in keep:
+                self.remove(run_id)
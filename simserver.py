@@ -0,0 +1,464 @@
+# simserver.py
+# 本地仿真服务：通过 localhost 上的 HTTP 接口接收 run_simulation 任务，
+# 排队后交给固定数量的工作进程计算，并以逐行 JSON 的形式回传进度与结果。
+import argparse
+import inspect
+import json
+import math
+import multiprocessing as mp
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.connection import wait as mp_wait
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_STEPS = 1_000_000  # 单个任务的最大步数 t_end / dt_sim，避免超长任务长期占用工作进程
+HEARTBEAT_INTERVAL = 1.0  # 进度流无变化时发送心跳的间隔 (s)
+
+# run_simulation 接受的参数及其类型（update_progress 由服务内部提供）
+SPEC_FIELDS = {
+    "scenario": int,
+    "Kp": float, "Ki": float, "Kd": float,
+    "J": float, "B": float, "Kt": float,
+    "K_h": float, "tau_h": float, "spool_max": float,
+    "t_end": float, "dt_sim": float,
+}
+REQUIRED_FIELDS = ("scenario", "Kp", "Ki", "Kd")
+RESULT_FIELDS = ("time_list", "phi_list", "theta_list", "phi_des_list")
+
+
+class SimServiceError(Exception):
+    pass
+
+
+def _spec_defaults():
+    # 从 run_simulation 的签名中读取默认值，保证显式传入默认值与省略参数视为同一任务
+    import models
+    params = inspect.signature(models.run_simulation).parameters
+    return {name: p.default for name, p in params.items()
+            if name in SPEC_FIELDS and p.default is not inspect.Parameter.empty}
+
+
+def normalize_spec(spec, defaults):
+    if not isinstance(spec, dict):
+        raise SimServiceError("任务参数必须是 JSON 对象")
+    unknown = set(spec) - set(SPEC_FIELDS)
+    if unknown:
+        raise SimServiceError(f"未知的任务参数: {', '.join(sorted(unknown))}")
+    missing = [name for name in REQUIRED_FIELDS if name not in spec]
+    if missing:
+        raise SimServiceError(f"缺少任务参数: {', '.join(missing)}")
+    normalized = dict(defaults)
+    for name, value in spec.items():
+        try:
+            normalized[name] = SPEC_FIELDS[name](value)
+        except (TypeError, ValueError, OverflowError):
+            raise SimServiceError(f"参数 {name} 的取值无效: {value!r}")
+        if isinstance(normalized[name], float) and not math.isfinite(normalized[name]):
+            raise SimServiceError(f"参数 {name} 必须为有限数值: {value!r}")
+    if normalized["scenario"] not in (1, 2, 3):
+        raise SimServiceError("scenario 必须为 1、2 或 3")
+    if normalized["dt_sim"] <= 0 or normalized["t_end"] <= 0:
+        raise SimServiceError("t_end 与 dt_sim 必须为正数")
+    if normalized["t_end"] / normalized["dt_sim"] > MAX_STEPS:
+        raise SimServiceError(f"仿真步数 t_end / dt_sim 不能超过 {MAX_STEPS}")
+    return normalized
+
+
+def spec_key(spec):
+    return json.dumps(spec, sort_keys=True)
+
+
+# ===== 工作进程 =====
+def _worker_main(conn):
+    # 每个工作进程只导入一次 models，模糊控制器在进程生命周期内保持预热；
+    # 任务与事件都经由该进程独占的管道收发，进程意外退出不会影响其他进程
+    import models
+
+    while True:
+        try:
+            item = conn.recv()
+        except EOFError:
+            break
+        if item is None:
+            break
+        job_id, spec = item
+        last_pct = [-1]
+
+        def report(value):
+            # run_simulation 每一步都会回调，这里只在整数百分比变化时上报
+            pct = int(value)
+            if pct != last_pct[0]:
+                last_pct[0] = pct
+                conn.send(("progress", job_id, pct))
+
+        try:
+            result = models.run_simulation(update_progress=report, **spec)
+        except Exception as exc:
+            conn.send(("error", job_id, repr(exc)))
+            continue
+        conn.send(("done", job_id, dict(zip(RESULT_FIELDS, result))))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job_id = None  # 由调度线程分配、尚未结束的任务
+
+
+class Job:
+    def __init__(self, job_id, key, spec):
+        self.job_id = job_id
+        self.key = key
+        self.spec = spec
+        self.status = "queued"  # queued / running / done / error
+        self.progress = 0
+        self.result = None
+        self.error = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def to_dict(self, include_result=False):
+        data = {"job_id": self.job_id, "status": self.status,
+                "progress": self.progress, "spec": self.spec}
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.status == "done":
+            data["result"] = self.result
+        return data
+
+
+# ===== 任务队列与工作进程池 =====
+class SimulationService:
+    def __init__(self, workers=2, cache_size=64):
+        self.workers = max(1, int(workers))
+        self.cache_size = cache_size
+        self._defaults = _spec_defaults()
+        self._ctx = mp.get_context()
+        self._pool = []
+        self._pending = deque()      # 等待分配的 job_id
+        self._wakeup_r, self._wakeup_w = self._ctx.Pipe(duplex=False)
+        self._stopping = False
+        self._dispatcher = None
+        self._cond = threading.Condition()
+        self._jobs = OrderedDict()   # job_id -> Job，按提交顺序保存
+        self._by_key = {}            # 规范化参数 -> job_id，用于去重
+        self._next_id = 1
+
+    def start(self):
+        self._stopping = False
+        self._pool = [_Worker(self._ctx) for _ in range(self.workers)]
+        self._dispatcher = threading.Thread(target=self._dispatch_events, daemon=True)
+        self._dispatcher.start()
+
+    def stop(self):
+        self._stopping = True
+        self._wakeup()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=5)
+            self._dispatcher = None
+        for worker in self._pool:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._pool:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        self._pool = []
+
+    def submit(self, spec):
+        spec = normalize_spec(spec, self._defaults)
+        key = spec_key(spec)
+        with self._cond:
+            job_id = self._by_key.get(key)
+            if job_id is not None:
+                # 相同参数的任务正在排队、计算或已有结果，直接复用
+                self._jobs.move_to_end(job_id)
+                return self._jobs[job_id], True
+            job_id = str(self._next_id)
+            self._next_id += 1
+            job = Job(job_id, key, spec)
+            self._jobs[job_id] = job
+            self._by_key[key] = job_id
+            self._pending.append(job_id)
+            self._evict_finished()
+        self._wakeup()
+        return job, False
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def wait(self, job, last_progress, timeout=None):
+        # 阻塞到任务进度变化或结束，返回最新的 (status, progress)
+        with self._cond:
+            self._cond.wait_for(
+                lambda: job.finished or job.progress != last_progress, timeout)
+            return job.status, job.progress
+
+    def _wakeup(self):
+        self._wakeup_w.send(None)
+
+    def _dispatch_events(self):
+        while not self._stopping:
+            self._assign_jobs()
+            conns = {worker.conn: worker for worker in self._pool}
+            sentinels = [worker.process.sentinel for worker in self._pool]
+            ready = mp_wait([self._wakeup_r] + list(conns) + sentinels, timeout=1.0)
+            for obj in ready:
+                if obj is self._wakeup_r:
+                    while self._wakeup_r.poll():
+                        self._wakeup_r.recv()
+                elif obj in conns:
+                    self._drain(conns[obj])
+            # 无论事件多少，每轮都检查工作进程是否异常退出
+            self._check_workers()
+
+    def _assign_jobs(self):
+        # 调度线程把排队任务逐个交给空闲的工作进程，并记录分配关系
+        with self._cond:
+            for worker in self._pool:
+                if worker.job_id is not None or not self._pending:
+                    continue
+                if not worker.process.is_alive():
+                    continue
+                job_id = self._pending.popleft()
+                job = self._jobs[job_id]
+                try:
+                    worker.conn.send((job_id, job.spec))
+                except OSError:
+                    # 工作进程已失效，任务放回队首，等待进程重启后重新分配
+                    self._pending.appendleft(job_id)
+                    continue
+                worker.job_id = job_id
+                job.status = "running"
+            self._cond.notify_all()
+
+    def _drain(self, worker):
+        while True:
+            try:
+                if not worker.conn.poll():
+                    return
+                event = worker.conn.recv()
+            except (EOFError, OSError):
+                return
+            self._handle_event(worker, event)
+
+    def _handle_event(self, worker, event):
+        kind, job_id, payload = event
+        with self._cond:
+            if kind in ("done", "error") and worker.job_id == job_id:
+                worker.job_id = None
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if kind == "progress":
+                    job.status = "running"
+                    job.progress = payload
+                elif kind == "done":
+                    job.status = "done"
+                    job.progress = 100
+                    job.result = payload
+                elif kind == "error":
+                    self._fail(job, payload)
+            self._cond.notify_all()
+
+    def _check_workers(self):
+        for index, worker in enumerate(self._pool):
+            if worker.process.is_alive():
+                continue
+            # 先读完管道中已送达的事件，再处理尚未结束的任务
+            self._drain(worker)
+            with self._cond:
+                # 工作进程被杀死或崩溃：分配给它的任务标记为失败，并补充新的工作进程
+                job = self._jobs.get(worker.job_id)
+                if job is not None and not job.finished:
+                    self._fail(job, f"工作进程异常退出 (exitcode={worker.process.exitcode})")
+                worker.conn.close()
+                self._pool[index] = _Worker(self._ctx)
+                self._cond.notify_all()
+
+    def _fail(self, job, error):
+        job.status = "error"
+        job.error = error
+        # 失败的任务不参与去重，重新提交时会再次计算
+        if self._by_key.get(job.key) == job.job_id:
+            del self._by_key[job.key]
+
+    def _evict_finished(self):
+        # 只淘汰已结束的任务，排队中和计算中的任务始终保留
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.cache_size)]:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+
+# ===== HTTP 接口 =====
+# POST /jobs                 提交任务，返回 {"job_id", "deduplicated", ...}
+# GET  /jobs/<id>            查询任务状态，结束后包含结果
+# GET  /jobs/<id>/stream     逐行 JSON 推送进度，最后一行为结果或错误
+class SimRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            spec = json.loads(self.rfile.read(length) or b"{}")
+            job, deduplicated = self.service.submit(spec)
+        except (ValueError, SimServiceError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+        data = job.to_dict()
+        data["deduplicated"] = deduplicated
+        self._send_json(200, data)
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("/") if p]
+        if len(parts) < 2 or parts[0] != "jobs" or len(parts) > 3:
+            self._send_json(404, {"error": "not found"})
+            return
+        job = self.service.get(parts[1])
+        if job is None:
+            self._send_json(404, {"error": f"任务不存在: {parts[1]}"})
+            return
+        if len(parts) == 2:
+            self._send_json(200, job.to_dict(include_result=True))
+        elif parts[2] == "stream":
+            self._stream(job)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _stream(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        progress = None
+        try:
+            while True:
+                status, new_progress = self.service.wait(job, progress, timeout=HEARTBEAT_INTERVAL)
+                if new_progress != progress and not job.finished:
+                    progress = new_progress
+                    self._write_line({"event": "progress", "progress": progress})
+                elif not job.finished:
+                    # 排队或长时间无进度时发送心跳，客户端据此区分“仍在计算”与“连接失效”
+                    self._write_line({"event": "heartbeat"})
+                if job.finished:
+                    self._write_line(dict(job.to_dict(include_result=True), event=status))
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_line(self, data):
+        self.wfile.write(json.dumps(data).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def _send_json(self, code, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=2, cache_size=64):
+    service = SimulationService(workers=workers, cache_size=cache_size)
+    service.start()
+    handler = type("BoundSimRequestHandler", (SimRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"仿真服务已启动: http://{host}:{port} （工作进程 {service.workers} 个）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+# ===== 客户端 =====
+class SimClient:
+    def __init__(self, address=f"{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=10.0, job_timeout=600.0):
+        if not address.startswith("http://"):
+            address = "http://" + address
+        self.base_url = address.rstrip("/")
+        self.timeout = timeout          # 单次读取的超时 (s)
+        self.job_timeout = job_timeout  # 等待单个任务结束的总时限 (s)，None 表示不限
+
+    def submit(self, **spec):
+        body = json.dumps(spec).encode("utf-8")
+        request = urllib.request.Request(self.base_url + "/jobs", data=body,
+                                         headers={"Content-Type": "application/json"})
+        return self._open_json(request)
+
+    def status(self, job_id):
+        return self._open_json(f"{self.base_url}/jobs/{job_id}")
+
+    def stream(self, job_id, update_progress=None):
+        # 跟随任务进度直到结束，返回与 run_simulation 相同的四个列表；
+        # 服务端每秒至少发送一次心跳，超过 timeout 未收到任何数据视为连接失效；
+        # 心跳只说明连接正常，任务总耗时超过 job_timeout 同样视为失败，避免服务卡死时调用方无限等待
+        deadline = None if self.job_timeout is None else time.monotonic() + self.job_timeout
+        with urllib.request.urlopen(f"{self.base_url}/jobs/{job_id}/stream",
+                                    timeout=self.timeout) as response:
+            for line in response:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise SimServiceError(f"仿真任务 {job_id} 超过 {self.job_timeout:g} s 仍未完成")
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["event"] == "progress":
+                    if update_progress:
+                        update_progress(event["progress"])
+                elif event["event"] == "error":
+                    raise SimServiceError(f"仿真任务 {job_id} 失败: {event.get('error')}")
+                elif event["event"] == "done":
+                    if update_progress:
+                        update_progress(100)
+                    result = event["result"]
+                    return tuple(result[name] for name in RESULT_FIELDS)
+        raise SimServiceError(f"仿真任务 {job_id} 的进度流意外中断")
+
+    def run_simulation(self, scenario, Kp, Ki, Kd, update_progress=None, **kwargs):
+        job = self.submit(scenario=scenario, Kp=Kp, Ki=Ki, Kd=Kd, **kwargs)
+        return self.stream(job["job_id"], update_progress=update_progress)
+
+    def _open_json(self, request):
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            try:
+                message = json.loads(exc.read()).get("error", exc.reason)
+            except ValueError:
+                message = exc.reason
+            raise SimServiceError(message)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="智能钻头控制仿真本地服务")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=max(1, (mp.cpu_count() or 2) - 1))
+    parser.add_argument("--cache-size", type=int, default=64)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.cache_size)
@@ -203,6 +203,8 @@ import csv
 
 # 从 models.py 中导入仿真函数
 from models import run_simulation
+from simserver import SimClient, SimServiceError, DEFAULT_HOST, DEFAULT_PORT
+from runstore import RunStore
 
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
@@ -213,12 +215,20 @@ rcParams['axes.unicode_minus'] = False
 rcParams['grid.linestyle'] = '--'
 rcParams['axes.facecolor'] = '#f5f5f5'
 
+# 叠加对比的曲线样式
+OVERLAY_COLORS = plt.get_cmap('tab20')
+OVERLAY_LINESTYLES = ['-', '--', ':', '-.']
+
 # 创建主窗口和UI组件
 class DrillSimUI(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("智能钻头控制仿真平台")
         self.geometry("1920x1080")
+        # 会话内的多次运行结果及叠加对比所用的曲线对象（run_id -> (ax1, ax2, ax3 上的曲线)）
+        self.run_store = RunStore()
+        self.overlay_lines = {}
+        self.overlay_active = False
         self.create_widgets()
 
     def create_widgets(self):
@@ -285,6 +295,16 @@ class DrillSimUI(tk.Tk):
         self.t_end_entry.insert(0, "5.0")
         self.dt_sim_entry.insert(0, "0.001")
 
+        # 仿真服务区域：勾选后将任务提交到本地仿真服务，而不是在界面进程内计算
+        service_frame = tk.LabelFrame(self, text="仿真服务", padx=10, pady=10)
+        service_frame.grid(row=0, column=3, sticky="w", padx=10, pady=10)
+        self.use_service_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(service_frame, text="提交到本地仿真服务", variable=self.use_service_var).grid(row=0, column=0, columnspan=2, sticky="w")
+        tk.Label(service_frame, text="服务地址:").grid(row=1, column=0, sticky="e")
+        self.service_entry = tk.Entry(service_frame, width=16)
+        self.service_entry.grid(row=1, column=1)
+        self.service_entry.insert(0, f"{DEFAULT_HOST}:{DEFAULT_PORT}")
+
         # 图表绘制风格选择区域
         style_frame = tk.LabelFrame(self, text="图表绘制风格", padx=10, pady=10)
         style_frame.grid(row=1, column=0, sticky="w", padx=10, pady=10)
@@ -301,6 +321,17 @@ class DrillSimUI(tk.Tk):
         self.canvas = FigureCanvasTkAgg(self.fig, master=self)
         self.canvas.get_tk_widget().grid(row=2, column=0, columnspan=3, padx=10, pady=10)
 
+        # 运行记录区域：多选后点击“叠加对比”在三张图上叠加显示
+        runs_frame = tk.LabelFrame(self, text="运行记录", padx=10, pady=10)
+        runs_frame.grid(row=2, column=3, columnspan=3, sticky="n", padx=10, pady=10)
+        self.run_listbox = tk.Listbox(runs_frame, selectmode=tk.EXTENDED, width=40, height=20, exportselection=False)
+        self.run_listbox.grid(row=0, column=0, columnspan=2)
+        self.run_list_ids = []
+        overlay_button = tk.Button(runs_frame, text="叠加对比", command=self.on_overlay, bg="#9C27B0", fg="white", font=("Arial", 12))
+        overlay_button.grid(row=1, column=0, pady=5)
+        clear_runs_button = tk.Button(runs_frame, text="清空记录", command=self.on_clear_runs, bg="#607D8B", fg="white", font=("Arial", 12))
+        clear_runs_button.grid(row=1, column=1, pady=5)
+
         # 按钮区域
         run_button = tk.Button(self, text="运行仿真", command=self.on_run, bg="#4CAF50", fg="white", font=("Arial", 12))
         run_button.grid(row=1, column=2, padx=10, pady=10)
@@ -343,12 +374,27 @@ class DrillSimUI(tk.Tk):
         self.progress["value"] = 0
         self.update_idletasks()
 
-        # 调用仿真函数时，将所有参数传入
-        time_list, phi_list, theta_list, phi_des_list = run_simulation(
-            scenario, Kp, Ki, Kd,
-            J, B, Kt, K_h, tau_h, spool_max,
-            t_end, dt_sim, update_progress=self.update_progress
-        )
+        if self.use_service_var.get():
+            # 提交到本地仿真服务，由服务端工作进程计算并回传进度
+            try:
+                # 等待时限按步数放宽（每步 50 ms），至少 10 分钟；非法步长交由服务端校验并报错
+                job_timeout = max(600.0, t_end / dt_sim * 0.05) if dt_sim > 0 else 600.0
+                client = SimClient(self.service_entry.get(), job_timeout=job_timeout)
+                time_list, phi_list, theta_list, phi_des_list = client.run_simulation(
+                    scenario, Kp, Ki, Kd,
+                    J=J, B=B, Kt=Kt, K_h=K_h, tau_h=tau_h, spool_max=spool_max,
+                    t_end=t_end, dt_sim=dt_sim, update_progress=self.update_progress
+                )
+            except (OSError, ValueError, SimServiceError) as exc:
+                messagebox.showerror("仿真服务错误", f"无法通过仿真服务完成计算：{exc}")
+                return
+        else:
+            # 调用仿真函数时，将所有参数传入
+            time_list, phi_list, theta_list, phi_des_list = run_simulation(
+                scenario, Kp, Ki, Kd,
+                J, B, Kt, K_h, tau_h, spool_max,
+                t_end, dt_sim, update_progress=self.update_progress
+            )
 
         self.time_list = time_list
         self.phi_list = phi_list
@@ -360,6 +406,13 @@ class DrillSimUI(tk.Tk):
         K_stiff = 1000.0
         self.F_h = K_stiff * np.array(self.phi_list)
 
+        # 保存到运行记录，供叠加对比使用
+        params = dict(scenario=scenario, Kp=Kp, Ki=Ki, Kd=Kd,
+                      J=J, B=B, Kt=Kt, K_h=K_h, tau_h=tau_h, spool_max=spool_max,
+                      t_end=t_end, dt_sim=dt_sim)
+        self.run_store.add(params, time_list, phi_list, theta_list, phi_des_list)
+        self.refresh_run_list()
+
         messagebox.showinfo("计算完成", "仿真计算已完成！请选择图表风格后点击生成图表。")
 
     def update_progress(self, value):
@@ -373,10 +426,12 @@ class DrillSimUI(tk.Tk):
 
         selected_style = self.style_var.get()
 
-        # 清空图表
+        # 清空图表（叠加对比的曲线对象随之失效）
         self.ax1.clear()
         self.ax2.clear()
         self.ax3.clear()
+        self.overlay_lines = {}
+        self.overlay_active = False
 
         # 绘制第一张图——姿态角
         if selected_style == "线条图":
@@ -428,6 +483,79 @@ class DrillSimUI(tk.Tk):
 
         self.canvas.draw()
 
+    def refresh_run_list(self):
+        # 同步列表框与运行记录，并移除已被淘汰运行的曲线
+        selected = {self.run_list_ids[i] for i in self.run_listbox.curselection()}
+        runs = self.run_store.runs()
+        self.run_list_ids = [run.run_id for run in runs]
+        self.run_listbox.delete(0, tk.END)
+        for index, run in enumerate(runs):
+            self.run_listbox.insert(tk.END, run.label)
+            if run.run_id in selected:
+                self.run_listbox.selection_set(index)
+        for run_id in [r for r in self.overlay_lines if r not in self.run_store]:
+            for line in self.overlay_lines.pop(run_id):
+                line.remove()
+
+    def on_overlay(self):
+        # 已被淘汰的运行可能仍留在列表框中，直接跳过
+        selection = [self.run_list_ids[i] for i in self.run_listbox.curselection()
+                     if self.run_list_ids[i] in self.run_store]
+        if not selection:
+            print("请先在运行记录中选择要对比的仿真结果！")
+            self.refresh_run_list()
+            return
+
+        if not self.overlay_active:
+            # 首次进入叠加视图时清空一次图表，之后只复用已有曲线对象
+            self.ax1.clear()
+            self.ax2.clear()
+            self.ax3.clear()
+            self.overlay_lines = {}
+            self.ax1.set_ylabel('姿态角 φ (°)', fontsize=12)
+            self.ax1.set_title('智能钻头控制仿真 - 多次运行对比', fontsize=14, fontweight='bold')
+            self.ax2.set_ylabel('侧向推力 F_h (N)', fontsize=12)
+            self.ax3.set_ylabel('阀芯角度 θ (°)', fontsize=12)
+            self.ax3.set_xlabel('时间 t (s)', fontsize=12)
+            self.ax1.grid(True)
+            self.ax2.grid(True)
+            self.ax3.grid(True)
+            self.overlay_active = True
+
+        wanted = set(selection)
+        for run_id, lines in self.overlay_lines.items():
+            for line in lines:
+                line.set_visible(run_id in wanted)
+
+        K_stiff = 1000.0
+        for run_id in selection:
+            if run_id in self.overlay_lines:
+                continue
+            # 运行结果不会改变，抽稀后的曲线只需创建一次；当前选择的运行不会因缓存抽稀数据而被淘汰
+            run = self.run_store.get(run_id)
+            t, phi, theta = self.run_store.decimated(run_id, keep=wanted)
+            # 20 种颜色 × 4 种线型，几十条曲线叠加时仍可区分
+            color = OVERLAY_COLORS((run_id - 1) % 20)
+            linestyle = OVERLAY_LINESTYLES[(run_id - 1) // 20 % len(OVERLAY_LINESTYLES)]
+            line1, = self.ax1.plot(t, np.degrees(phi), color=color, linestyle=linestyle, label=run.label, linewidth=1.5)
+            line2, = self.ax2.plot(t, K_stiff * phi, color=color, linestyle=linestyle, linewidth=1.5)
+            line3, = self.ax3.plot(t, np.degrees(theta), color=color, linestyle=linestyle, linewidth=1.5)
+            self.overlay_lines[run_id] = (line1, line2, line3)
+
+        for ax in (self.ax1, self.ax2, self.ax3):
+            ax.relim(visible_only=True)
+            ax.autoscale_view()
+        handles = [self.overlay_lines[run_id][0] for run_id in selection]
+        self.ax1.legend(handles=handles, fontsize=8, loc='best')
+        self.refresh_run_list()
+        self.canvas.draw_idle()
+
+    def on_clear_runs(self):
+        for run in self.run_store.runs():
+            self.run_store.remove(run.run_id)
+        self.refresh_run_list()
+        self.canvas.draw_idle()
+
     def on_save(self):
         file_path = filedialog.asksaveasfilename(title="保存图像",
                                                  filetypes=[("PNG Image", "*.png")],